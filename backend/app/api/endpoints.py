@@ -1,29 +1,89 @@
-from fastapi import APIRouter, UploadFile, File, Form, WebSocket, WebSocketDisconnect, Depends, HTTPException, Request
+from fastapi import APIRouter, UploadFile, File, Form, WebSocket, WebSocketDisconnect, Depends, HTTPException, Request, BackgroundTasks
 from fastapi.responses import HTMLResponse
+from fastapi.concurrency import run_in_threadpool, iterate_in_threadpool
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
 from typing import List
 import shutil
 import os
 import uuid
+import threading
 
-from ..db.connection import get_db
+from ..db.connection import get_db, SessionLocal
 from ..models.database import Collection, Document, IngestionStatus
 from ..services.ingestion import IngestionService
 from ..services.retrieval import RetrievalService
 from ..services.llm import LLMService
+from ..services.deletion import DeletionService
+from ..services.admission import AdmissionController, AdmissionRejected
 import time
 import json
 from ..config import settings
 from ..models.database import Collection, Document, IngestionStatus, Message
+from ..models.schemas import BatchSearchRequest, IndexParams, MAX_CHAT_COLLECTIONS
 
 router = APIRouter()
 templates = Jinja2Templates(directory="backend/templates")
 
+# Number of chunks embedded and written to the vector store per call during ingestion
+INGEST_BATCH_SIZE = 256
+
+UPLOAD_ROOT = "uploads"
+
 # Services (Singletons for simplicity in this scope)
 ingestion_service = IngestionService()
 retrieval_service = RetrievalService()
 llm_service = LLMService()
+deletion_service = DeletionService(retrieval_service, upload_root=UPLOAD_ROOT)
+
+# Admission control, keyed per collection
+ingest_admission = AdmissionController(
+    "ingest",
+    max_concurrency=settings.INGEST_MAX_CONCURRENCY,
+    per_key_concurrency=settings.INGEST_PER_COLLECTION_CONCURRENCY,
+    max_queue=settings.INGEST_MAX_QUEUE,
+    target_wait_s=settings.ADMISSION_TARGET_WAIT_S,
+    max_rss_mb=settings.ADMISSION_MAX_RSS_MB
+)
+chat_admission = AdmissionController(
+    "chat",
+    max_concurrency=settings.CHAT_MAX_CONCURRENCY,
+    per_key_concurrency=settings.CHAT_PER_COLLECTION_CONCURRENCY,
+    max_queue=settings.CHAT_MAX_QUEUE,
+    target_wait_s=settings.ADMISSION_TARGET_WAIT_S,
+    max_rss_mb=settings.ADMISSION_MAX_RSS_MB
+)
+
+def resume_pending_deletes():
+    """
+    Hide data from deletes interrupted by a restart and finish purging it in the background.
+    """
+    tombstone_ids = deletion_service.resume()
+    if tombstone_ids:
+        worker = threading.Thread(
+            target=lambda: [deletion_service.purge(t) for t in tombstone_ids],
+            daemon=True
+        )
+        worker.start()
+
+def migrate_legacy_vectors():
+    """
+    Move vectors indexed before the chunk store into it in the background. Searches
+    read them in place until it's done.
+    """
+    if retrieval_service.legacy_pending:
+        threading.Thread(target=retrieval_service.migrate_legacy, daemon=True).start()
+
+def fail_interrupted_ingests():
+    """
+    Documents still PROCESSING at startup lost their ingest to a restart; mark them
+    FAILED so they can be deleted and re-uploaded.
+    """
+    with SessionLocal() as db:
+        db.query(Document).filter(Document.status == IngestionStatus.PROCESSING).update(
+            {Document.status: IngestionStatus.FAILED}
+        )
+        db.commit()
 
 # --- Page Routes ---
 @router.get("/", response_class=HTMLResponse)
@@ -64,14 +124,61 @@ async def create_collection(name: str = Form(...), db: Session = Depends(get_db)
     collections = db.query(Collection).all()
     return templates.TemplateResponse("partials/sidebar.html", {"request": {}, "collections": collections})
 
+def _index_document(file_path: str, doc_id: str, filename: str, collection_id: str) -> int:
+    """
+    Parse, embed and store a saved upload. Returns the approximate token count.
+    """
+    # Chunks are streamed and written in batches so large files never sit in memory at once
+    texts, metadatas, ids = [], [], []
+    chunk_count = 0
+    token_count = 0
+    for c in ingestion_service.iter_ingest(file_path, source_doc_id=doc_id):
+        texts.append(c["text"])
+        metadatas.append({
+            "collection_id": collection_id,
+            "source_doc_id": doc_id,
+            "filename": filename,
+            "page_number": c["metadata"]["page_number"],
+            "line_number": c["metadata"].get("line_number"),
+            "paragraph": c["metadata"].get("paragraph"),
+            "section": c["metadata"].get("section", "")
+        })
+        ids.append(f"{doc_id}_{chunk_count}")
+        chunk_count += 1
+
+        if len(texts) >= INGEST_BATCH_SIZE:
+            retrieval_service.add_texts(texts, metadatas, ids)
+            token_count += sum(len(t) for t in texts) # Approx
+            texts, metadatas, ids = [], [], []
+
+    if texts:
+        retrieval_service.add_texts(texts, metadatas, ids)
+        token_count += sum(len(t) for t in texts)
+    return token_count
+
 @router.post("/ingest")
 async def ingest_file(
     collection_id: str = Form(...),
     file: UploadFile = File(...),
     db: Session = Depends(get_db)
 ):
+    try:
+        async with ingest_admission.slot(collection_id):
+            return await _ingest_admitted(collection_id, file, db)
+    except AdmissionRejected:
+        return HTMLResponse(
+            "<div class='text-red-500'>The Vault is busy ingesting, please retry shortly.</div>",
+            status_code=429,
+            headers={"Retry-After": "10"}
+        )
+
+async def _ingest_admitted(collection_id: str, file: UploadFile, db: Session):
+    # The collection may have been deleted while this request was queued
+    if not db.query(Collection).filter(Collection.id == collection_id).first():
+        return HTMLResponse("<div class='text-red-500'>Collection not found</div>", status_code=404)
+
     # 1. Save File Locally
-    upload_dir = f"uploads/{collection_id}"
+    upload_dir = f"{UPLOAD_ROOT}/{collection_id}"
     os.makedirs(upload_dir, exist_ok=True)
     file_path = f"{upload_dir}/{file.filename}"
     
@@ -89,27 +196,10 @@ async def ingest_file(
     db.commit()
     db.refresh(doc)
     
-    # 3. Process (Ingest + Embed) - Ideally async background task
+    # 3. Process (Ingest + Embed) in the threadpool so the event loop keeps serving other requests
     try:
-        chunks = ingestion_service.ingest(file_path, source_doc_id=doc.id)
-        
-        # Prepare for Vector Store
-        texts = [c["text"] for c in chunks]
-        metadatas = [
-            {
-                "collection_id": collection_id,
-                "source_doc_id": doc.id,
-                "filename": doc.filename,
-                "page_number": c["metadata"]["page_number"]
-            } 
-            for c in chunks
-        ]
-        ids = [f"{doc.id}_{i}" for i in range(len(chunks))]
-        
-        retrieval_service.add_texts(texts, metadatas, ids)
-        
+        doc.token_count = await run_in_threadpool(_index_document, file_path, doc.id, doc.filename, collection_id)
         doc.status = IngestionStatus.DONE
-        doc.token_count = sum(len(t) for t in texts) # Approx
         db.commit()
         
         return f"""<div class='text-green-500'>Successfully processed {file.filename}</div>"""
@@ -118,57 +208,176 @@ async def ingest_file(
         db.commit()
         return f"""<div class='text-red-500'>Failed: {str(e)}</div>"""
 
+@router.delete("/collections/{collection_id}")
+async def delete_collection(collection_id: str, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    collection = db.query(Collection).filter(Collection.id == collection_id).first()
+    if not collection:
+        raise HTTPException(status_code=404, detail="Collection not found")
+    # An ingest holds its admission slot until its document is fully indexed
+    if ingest_admission.active(collection_id):
+        raise HTTPException(status_code=409, detail="Collection has uploads in progress")
+
+    # Hidden from search immediately; vectors and uploads are purged after the response
+    tombstone_id = deletion_service.tombstone_collection(db, collection)
+    background_tasks.add_task(deletion_service.purge, tombstone_id)
+
+    # Return sidebar partial update
+    collections = db.query(Collection).all()
+    return templates.TemplateResponse("partials/sidebar.html", {"request": {}, "collections": collections})
+
+@router.delete("/documents/{document_id}")
+async def delete_document(document_id: str, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    doc = db.query(Document).filter(Document.id == document_id).first()
+    if not doc:
+        raise HTTPException(status_code=404, detail="Document not found")
+    if doc.status in (IngestionStatus.PENDING, IngestionStatus.PROCESSING):
+        raise HTTPException(status_code=409, detail="Document is still being processed")
+
+    tombstone_id = deletion_service.tombstone_document(db, doc)
+    background_tasks.add_task(deletion_service.purge, tombstone_id)
+    return {"status": "deleting", "document_id": document_id}
+
 # --- Chat WebSocket ---
 
+def _parse_chat_payload(raw: str, collection_id: str):
+    """
+    Returns (query, collection_ids). The chat's own collection is always searched.
+    Raises ValueError for a malformed JSON message.
+    """
+    try:
+        payload = json.loads(raw)
+    except ValueError:
+        return raw, [collection_id]
+    if not isinstance(payload, dict) or "query" not in payload:
+        return raw, [collection_id]
+
+    query = payload["query"]
+    if not isinstance(query, str) or not query.strip():
+        raise ValueError("query must be a non-empty string")
+    extra_ids = payload.get("collection_ids") or []
+    if not isinstance(extra_ids, list) or not all(isinstance(c, str) for c in extra_ids):
+        raise ValueError("collection_ids must be a list of strings")
+    collection_ids = list(dict.fromkeys([collection_id] + extra_ids))
+    if len(collection_ids) > MAX_CHAT_COLLECTIONS:
+        raise ValueError(f"a chat can search at most {MAX_CHAT_COLLECTIONS} collections")
+    return query, collection_ids
+
 @router.websocket("/ws/chat/{collection_id}")
 async def websocket_endpoint(websocket: WebSocket, collection_id: str):
     await websocket.accept()
     try:
         while True:
-            data = await websocket.receive_text()
-            # data is the user query
-            
-            # 1. Save User Message
-            # Note: We need a new detailed DB session or reuse the dependency if possible. 
-            # However, Websocket endpoint signature in FastAPI doesn't easily support Depends(get_db) directly in the loop 
-            # without some hacks or using a context manager.
-            # Simplified: Create a session manually for this loop.
+            raw = await websocket.receive_text()
+            # raw is either the plain user query, or JSON:
+            # {"query": "...", "collection_ids": ["...", "..."]} to search several collections
+            try:
+                data, collection_ids = _parse_chat_payload(raw, collection_id)
+            except ValueError as e:
+                await websocket.send_json({"type": "error", "data": f"Invalid message: {e}"})
+                continue
             
-            with next(get_db()) as db:
-                user_msg = Message(collection_id=collection_id, role="user", content=data)
-                db.add(user_msg)
-                db.commit()
+            # Wait for a chat slot, telling the client if it has to queue
+            if chat_admission.would_queue(collection_id):
+                await websocket.send_json({"type": "queued", "data": chat_admission.waiting + 1})
+            try:
+                await chat_admission.acquire(collection_id)
+            except AdmissionRejected:
+                await websocket.send_json({"type": "error", "data": "The Vault is busy, please try again shortly."})
+                continue
 
-                # 2. Retrieve
-                chunks = retrieval_service.search(collection_id, query=data)
+            try:
+                # 1. Save User Message
+                # Note: We need a new detailed DB session or reuse the dependency if possible.
+                # However, Websocket endpoint signature in FastAPI doesn't easily support Depends(get_db) directly in the loop
+                # without some hacks or using a context manager.
+                # Simplified: Create a session manually for this loop.
+
+                with next(get_db()) as db:
+                    user_msg = Message(collection_id=collection_id, role="user", content=data)
+                    db.add(user_msg)
+                    db.commit()
+
+                    # 2. Retrieve (fans out in parallel when several collections are requested)
+                    if len(collection_ids) > 1:
+                        chunks = await run_in_threadpool(retrieval_service.search_collections, collection_ids, query=data)
+                    else:
+                        chunks = await run_in_threadpool(retrieval_service.search, collection_id, query=data)
                 
-                # 3. Generate & Stream
-                full_response = ""
-                sources_list = []
+                    # 3. Generate & Stream
+                    full_response = ""
+                    sources_list = []
                 
-                for event in llm_service.generate_response(chunks, data):
-                    if event["type"] == "citation":
-                        sources_list = event["data"]
-                    elif event["type"] == "token":
-                        full_response += event["data"]
-                    await websocket.send_json(event)
+                    async for event in iterate_in_threadpool(llm_service.generate_response(chunks, data)):
+                        if event["type"] == "citation":
+                            sources_list = event["data"]
+                        elif event["type"] == "token":
+                            full_response += event["data"]
+                        await websocket.send_json(event)
                 
-                # 4. Save AI Message
-                ai_msg = Message(
-                    collection_id=collection_id, 
-                    role="assistant", 
-                    content=full_response,
-                    sources=json.dumps(sources_list)
-                )
-                db.add(ai_msg)
-                db.commit()
+                    # 4. Save AI Message
+                    ai_msg = Message(
+                        collection_id=collection_id, 
+                        role="assistant", 
+                        content=full_response,
+                        sources=json.dumps(sources_list)
+                    )
+                    db.add(ai_msg)
+                    db.commit()
                 
-                # End of message signal
-                await websocket.send_json({"type": "done"})
+                    # End of message signal
+                    await websocket.send_json({"type": "done"})
+            finally:
+                await chat_admission.release(collection_id)
             
     except WebSocketDisconnect:
         print("Client disconnected")
 
+# --- Search API ---
+
+@router.post("/api/search/batch")
+def search_batch(request: BatchSearchRequest):
+    # Sync route: FastAPI runs it in the threadpool so embedding doesn't block the loop
+    results = retrieval_service.search_many(
+        [(q.collection_id, q.query) for q in request.queries],
+        top_k=request.top_k,
+        fuse=request.fuse
+    )
+    return {"results": results}
+
+@router.get("/collections/{collection_id}/index")
+def get_index_params(collection_id: str):
+    pending = retrieval_service.rebuilds.get(collection_id)
+    if pending:
+        return {"params": pending, "status": "rebuilding"}
+    return {"params": retrieval_service.get_index_params(collection_id), "status": "ready"}
+
+@router.put("/collections/{collection_id}/index", status_code=202)
+def configure_index(
+    collection_id: str,
+    params: IndexParams,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
+    if not db.query(Collection).filter(Collection.id == collection_id).first():
+        raise HTTPException(status_code=404, detail="Collection not found")
+    # The copy only sees migrated vectors
+    if retrieval_service.legacy_pending:
+        raise HTTPException(status_code=409, detail="Vector migration still running, retry shortly")
+    if not retrieval_service.start_rebuild(collection_id, params):
+        raise HTTPException(status_code=409, detail="Index is already being rebuilt")
+    # Rebuilds the collection's index after the response; poll GET for its status.
+    # Use the tuning harness to pick params first.
+    background_tasks.add_task(retrieval_service.configure_index, collection_id, params)
+    return {"params": params, "status": "rebuilding"}
+
+@router.get("/api/admission")
+def admission_stats():
+    # Queue depth and rejection counts, for sizing nodes
+    return {
+        "ingest": ingest_admission.stats(),
+        "chat": chat_admission.stats()
+    }
+
 @router.get("/api/test-brain")
 async def test_brain():
     start = time.time()
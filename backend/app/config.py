@@ -4,6 +4,17 @@ from pydantic_settings import BaseSettings
 class Settings(BaseSettings):
     GROQ_API_KEY: str = os.getenv("GROQ_API_KEY", "")
     GROQ_MODEL: str = "llama-3.3-70b-versatile"
+    RETRIEVAL_TOP_K: int = 4 # Chunks retrieved per query when the caller doesn't say
+
+    # Admission control: requests over the concurrency limits wait in a bounded queue
+    INGEST_MAX_CONCURRENCY: int = 2
+    INGEST_PER_COLLECTION_CONCURRENCY: int = 1
+    INGEST_MAX_QUEUE: int = 8
+    CHAT_MAX_CONCURRENCY: int = 16
+    CHAT_PER_COLLECTION_CONCURRENCY: int = 4
+    CHAT_MAX_QUEUE: int = 64
+    ADMISSION_TARGET_WAIT_S: float = 5.0 # queues shrink while the average wait is above this
+    ADMISSION_MAX_RSS_MB: int = 0 # concurrency shrinks while RSS is above this (0 = off)
     
     class Config:
         env_file = ".env"
@@ -1,7 +1,7 @@
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from .db.connection import init_db
-from .api.endpoints import router
+from .api.endpoints import router, resume_pending_deletes, fail_interrupted_ingests, migrate_legacy_vectors
 
 app = FastAPI(title="RAG Vault API")
 
@@ -14,6 +14,9 @@ app.include_router(router)
 @app.on_event("startup")
 def on_startup():
     init_db()
+    fail_interrupted_ingests()
+    resume_pending_deletes()
+    migrate_legacy_vectors()
 
 @app.get("/health")
 def health_check():
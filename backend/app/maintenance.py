@@ -0,0 +1,63 @@
+"""
+Offline maintenance for the vector index and metadata database.
+Stop the API first, then run from the repository root:
+
+    python -m backend.app.maintenance compact
+"""
+import argparse
+import os
+from typing import Dict, Any
+from .db.connection import engine, init_db
+from .services.deletion import DeletionService
+from .services.retrieval import RetrievalService
+
+def vacuum_database() -> Dict[str, Any]:
+    """
+    VACUUM the SQLite metadata database and report how much space it gave back.
+    """
+    db_path = engine.url.database
+    bytes_before = os.path.getsize(db_path) if os.path.exists(db_path) else 0
+    # VACUUM cannot run inside a transaction
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.exec_driver_sql("VACUUM")
+    bytes_after = os.path.getsize(db_path) if os.path.exists(db_path) else 0
+    return {
+        "bytes_before": bytes_before,
+        "bytes_after": bytes_after,
+        "bytes_reclaimed": bytes_before - bytes_after
+    }
+
+def compact() -> Dict[str, Any]:
+    init_db()
+    retrieval_service = RetrievalService()
+
+    # Finish interrupted deletes first so their vectors are not copied into the new index
+    deletion_service = DeletionService(retrieval_service)
+    purged = sum(deletion_service.purge(t) for t in deletion_service.resume())
+
+    return {
+        "purged_vectors": purged,
+        "vectors": retrieval_service.compact(),
+        "database": vacuum_database()
+    }
+
+def _format_bytes(n: int) -> str:
+    return f"{n / (1024 * 1024):.2f} MB"
+
+def main():
+    parser = argparse.ArgumentParser(description="RAG Vault maintenance")
+    parser.add_argument("command", choices=["compact"], help="compact: purge pending deletes, rebuild the vector index and vacuum SQLite")
+    parser.parse_args()
+
+    report = compact()
+    vectors = report["vectors"]
+    database = report["database"]
+    print(f"Purged vectors from pending deletes: {report['purged_vectors']}")
+    print(f"Vector index: {vectors['vectors']} live vectors, "
+          f"{_format_bytes(vectors['bytes_before'])} -> {_format_bytes(vectors['bytes_after'])} "
+          f"(reclaimed {_format_bytes(vectors['bytes_reclaimed'])})")
+    print(f"Metadata DB: {_format_bytes(database['bytes_before'])} -> {_format_bytes(database['bytes_after'])} "
+          f"(reclaimed {_format_bytes(database['bytes_reclaimed'])})")
+
+if __name__ == "__main__":
+    main()
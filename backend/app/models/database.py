@@ -45,4 +45,17 @@ class Document(Base):
     token_count = Column(Integer, default=0)
     created_at = Column(DateTime, default=datetime.utcnow)
 
-    collection = relationship("Collection", back_populates="documents")
\ No newline at end of file
+    collection = relationship("Collection", back_populates="documents")
+
+class Tombstone(Base):
+    """
+    Marks a deleted document or collection whose vectors and files are still being purged.
+    Searches exclude tombstoned data; the row is removed once the purge finishes.
+    """
+    __tablename__ = "tombstones"
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    kind = Column(String, nullable=False) # document / collection
+    target_id = Column(String, nullable=False)
+    collection_id = Column(String, nullable=False)
+    filename = Column(String, nullable=True) # documents only, to remove the upload
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,27 @@
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
+
+# Limits for one batch search request, so a single call can't pin the embedder and index
+MAX_BATCH_QUERIES = 64
+MAX_TOP_K = 50
+
+# Collections one chat message can search, since each one is a parallel query
+MAX_CHAT_COLLECTIONS = 8
+
+class SearchQuery(BaseModel):
+    collection_id: str
+    query: str
+
+class BatchSearchRequest(BaseModel):
+    queries: List[SearchQuery] = Field(..., min_length=1, max_length=MAX_BATCH_QUERIES)
+    top_k: Optional[int] = Field(None, gt=0, le=MAX_TOP_K) # Defaults to settings.RETRIEVAL_TOP_K
+    fuse: bool = False # Merge all result lists into one (query expansion)
+
+class IndexParams(BaseModel):
+    """
+    HNSW settings for a collection's vector index. Defaults match Chroma's.
+    """
+    space: Literal["l2", "cosine", "ip"] = "l2"
+    construction_ef: int = Field(100, gt=0) # Candidate list size while building; higher = better graph, slower inserts
+    M: int = Field(16, gt=1) # Links per node; higher = better recall, more memory
+    search_ef: int = Field(10, gt=0) # Candidate list size while searching; higher = better recall, slower queries
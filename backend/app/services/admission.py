@@ -0,0 +1,155 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Any
+
+# How often the adaptive limits may change
+ADJUST_INTERVAL_S = 1.0
+
+# Weight of the newest sample in the queue-wait moving average
+WAIT_EWMA_ALPHA = 0.2
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a request arrives while the wait queue is full.
+    """
+
+def current_rss_mb() -> float:
+    """
+    Resident memory of this process in MB, or 0.0 where /proc is unavailable.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError, IndexError):
+        return 0.0
+
+class AdmissionController:
+    """
+    Limits how many requests of one kind run at once, globally and per collection.
+    Requests over the limit wait in a bounded queue and are rejected once it is full.
+
+    Both bounds adapt (additive increase, multiplicative decrease):
+    - the concurrency limit halves while RSS is above max_rss_mb and grows back by one when it is not;
+    - the queue bound halves while the average queue wait is above target_wait_s, so requests
+      that would wait too long are turned away up front instead of piling up.
+    """
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        per_key_concurrency: int,
+        max_queue: int,
+        target_wait_s: float = 5.0,
+        max_rss_mb: float = 0,
+        min_concurrency: int = 1
+    ):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.per_key_concurrency = per_key_concurrency
+        self.max_queue = max_queue
+        self.target_wait_s = target_wait_s
+        self.max_rss_mb = max_rss_mb # 0 disables the memory check
+        self.min_concurrency = min_concurrency
+
+        self.limit = max_concurrency
+        self.queue_limit = max_queue
+        self.in_flight = 0
+        self.waiting = 0
+        self.per_key: Dict[str, int] = {}
+        self.admitted = 0
+        self.rejected = 0
+        self.avg_wait_s = 0.0
+        self.rss_mb = 0.0
+        self._last_adjust = 0.0
+        self._cond = asyncio.Condition()
+
+    def would_queue(self, key: str) -> bool:
+        """
+        True if a request for `key` would have to wait right now.
+        """
+        return not self._has_capacity(key)
+
+    def active(self, key: str) -> int:
+        """
+        Number of admitted requests for `key` that have not been released yet.
+        """
+        return self.per_key.get(key, 0)
+
+    @asynccontextmanager
+    async def slot(self, key: str):
+        """
+        Hold one slot for `key` for the duration of the block.
+        Raises AdmissionRejected if the queue is full.
+        """
+        await self.acquire(key)
+        try:
+            yield
+        finally:
+            await self.release(key)
+
+    async def acquire(self, key: str):
+        start = time.monotonic()
+        async with self._cond:
+            if not self._has_capacity(key):
+                if self.waiting >= self.queue_limit:
+                    self.rejected += 1
+                    raise AdmissionRejected(f"{self.name} queue is full")
+                self.waiting += 1
+                try:
+                    await self._cond.wait_for(lambda: self._has_capacity(key))
+                finally:
+                    self.waiting -= 1
+
+            self.in_flight += 1
+            self.per_key[key] = self.per_key.get(key, 0) + 1
+            self.admitted += 1
+            self._adapt(time.monotonic() - start)
+
+    async def release(self, key: str):
+        async with self._cond:
+            self.in_flight -= 1
+            self.per_key[key] -= 1
+            if not self.per_key[key]:
+                del self.per_key[key]
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "queue_limit": self.queue_limit,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "avg_queue_wait_ms": round(self.avg_wait_s * 1000, 1),
+            "rss_mb": round(self.rss_mb, 1)
+        }
+
+    def _has_capacity(self, key: str) -> bool:
+        return self.in_flight < self.limit and self.per_key.get(key, 0) < self.per_key_concurrency
+
+    def _adapt(self, wait_s: float):
+        # Caller holds the condition lock
+        self.avg_wait_s = (1 - WAIT_EWMA_ALPHA) * self.avg_wait_s + WAIT_EWMA_ALPHA * wait_s
+
+        now = time.monotonic()
+        if now - self._last_adjust < ADJUST_INTERVAL_S:
+            return
+        self._last_adjust = now
+
+        self.rss_mb = current_rss_mb()
+        if self.max_rss_mb and self.rss_mb > self.max_rss_mb:
+            self.limit = max(self.min_concurrency, self.limit // 2)
+        elif self.limit < self.max_concurrency:
+            self.limit += 1
+            # Raising the limit may let queued requests in
+            self._cond.notify_all()
+
+        if self.avg_wait_s > self.target_wait_s:
+            self.queue_limit = max(1, self.queue_limit // 2)
+        elif self.queue_limit < self.max_queue:
+            self.queue_limit += 1
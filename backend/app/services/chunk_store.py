@@ -0,0 +1,193 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import List, Dict, Any, Optional, Iterable, Tuple
+
+# Length of the citation snippet shown in the UI
+SNIPPET_CHARS = 80
+
+class ChunkStore:
+    """
+    Holds chunk text and citation data next to the vector index, keyed by chunk id.
+    Repeated strings (collection ids, document ids, filenames, sections) are interned
+    once as integer refs, so each chunk row is its text, its snippet and a few ints,
+    and the vector store only needs the integer refs it filters on.
+    """
+    def __init__(self, persist_dir: str = "./chroma_db"):
+        os.makedirs(persist_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(persist_dir, "chunks.sqlite3"), check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS refs (
+                ref INTEGER PRIMARY KEY,
+                key TEXT UNIQUE NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS chunks (
+                chunk_id TEXT PRIMARY KEY,
+                collection_ref INTEGER NOT NULL,
+                doc_ref INTEGER NOT NULL,
+                filename_ref INTEGER NOT NULL,
+                section_ref INTEGER NOT NULL,
+                page_number INTEGER,
+                line_number INTEGER,
+                paragraph INTEGER,
+                text TEXT NOT NULL,
+                snippet TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS chunks_collection ON chunks(collection_ref);
+            CREATE INDEX IF NOT EXISTS chunks_doc ON chunks(doc_ref);
+            CREATE TABLE IF NOT EXISTS indexes (
+                collection_ref INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                params TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS state (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+        """)
+        # Stores created before line and paragraph locators were kept
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(chunks)")}
+        for column in ("line_number", "paragraph"):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE chunks ADD COLUMN {column} INTEGER")
+        self._conn.commit()
+        # Refs are few and hot, keep both directions in memory
+        self._refs: Dict[str, int] = {}
+        self._keys: Dict[int, str] = {}
+        for ref, key in self._conn.execute("SELECT ref, key FROM refs"):
+            self._refs[key] = ref
+            self._keys[ref] = key
+
+    def ref(self, key: str) -> Optional[int]:
+        """
+        Integer ref for a string, or None if it was never stored.
+        """
+        return self._refs.get(key)
+
+    def add(self, ids: List[str], texts: List[str], metadatas: List[Dict[str, Any]]) -> List[Dict[str, int]]:
+        """
+        Store chunks and return the compact metadata to index alongside their vectors.
+        """
+        rows = []
+        vector_metadatas = []
+        with self._lock:
+            for chunk_id, text, meta in zip(ids, texts, metadatas):
+                collection_ref = self._intern(str(meta.get("collection_id", "")))
+                doc_ref = self._intern(str(meta.get("source_doc_id", "")))
+                rows.append((
+                    chunk_id,
+                    collection_ref,
+                    doc_ref,
+                    self._intern(str(meta.get("filename", ""))),
+                    self._intern(str(meta.get("section", ""))),
+                    meta.get("page_number"),
+                    meta.get("line_number"),
+                    meta.get("paragraph"),
+                    text,
+                    text[:SNIPPET_CHARS].replace("\n", " ") + "..."
+                ))
+                vector_metadatas.append({"collection_ref": collection_ref, "doc_ref": doc_ref})
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks (chunk_id, collection_ref, doc_ref, filename_ref, section_ref, "
+                "page_number, line_number, paragraph, text, snippet) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+        return vector_metadatas
+
+    def get_many(self, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Look up chunks by id. Returns {chunk_id: {"text", "snippet", "metadata"}}.
+        """
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT chunk_id, collection_ref, doc_ref, filename_ref, section_ref, page_number, line_number, paragraph, text, snippet "
+                f"FROM chunks WHERE chunk_id IN ({placeholders})",
+                ids
+            ).fetchall()
+
+        chunks = {}
+        for chunk_id, collection_ref, doc_ref, filename_ref, section_ref, page_number, line_number, paragraph, text, snippet in rows:
+            chunks[chunk_id] = {
+                "text": text,
+                "snippet": snippet,
+                "metadata": {
+                    "collection_id": self._keys[collection_ref],
+                    "source_doc_id": self._keys[doc_ref],
+                    "filename": self._keys[filename_ref],
+                    "section": self._keys[section_ref],
+                    "page_number": page_number,
+                    "line_number": line_number,
+                    "paragraph": paragraph
+                }
+            }
+        return chunks
+
+    def chunk_ids(self, collection_id: Optional[str] = None, source_doc_id: Optional[str] = None, limit: int = 5000) -> List[str]:
+        """
+        Up to `limit` chunk ids belonging to a collection or a document.
+        """
+        if collection_id is not None:
+            column, ref = "collection_ref", self.ref(collection_id)
+        else:
+            column, ref = "doc_ref", self.ref(source_doc_id)
+        if ref is None:
+            return []
+        with self._lock:
+            rows = self._conn.execute(f"SELECT chunk_id FROM chunks WHERE {column} = ? LIMIT ?", (ref, limit)).fetchall()
+        return [row[0] for row in rows]
+
+    def delete(self, ids: Iterable[str]):
+        with self._lock:
+            self._conn.executemany("DELETE FROM chunks WHERE chunk_id = ?", ((i,) for i in ids))
+            self._conn.commit()
+
+    def indexes(self) -> Dict[str, Tuple[str, Dict[str, Any]]]:
+        """
+        Collections with a dedicated vector index: {collection_id: (index name, params)}.
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT collection_ref, name, params FROM indexes").fetchall()
+        return {self._keys[ref]: (name, json.loads(params)) for ref, name, params in rows}
+
+    def set_index(self, collection_id: str, name: str, params: Dict[str, Any]):
+        with self._lock:
+            ref = self._intern(collection_id)
+            self._conn.execute("INSERT OR REPLACE INTO indexes VALUES (?, ?, ?)", (ref, name, json.dumps(params)))
+            self._conn.commit()
+
+    def remove_index(self, collection_id: str):
+        ref = self.ref(collection_id)
+        if ref is None:
+            return
+        with self._lock:
+            self._conn.execute("DELETE FROM indexes WHERE collection_ref = ?", (ref,))
+            self._conn.commit()
+
+    def get_state(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_state(self, key: str, value: str):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO state VALUES (?, ?)", (key, value))
+            self._conn.commit()
+
+    def vacuum(self):
+        with self._lock:
+            self._conn.execute("VACUUM")
+
+    def _intern(self, key: str) -> int:
+        # Caller holds the lock
+        ref = self._refs.get(key)
+        if ref is None:
+            ref = self._conn.execute("INSERT INTO refs (key) VALUES (?)", (key,)).lastrowid
+            self._refs[key] = ref
+            self._keys[ref] = key
+        return ref
@@ -0,0 +1,78 @@
+import os
+import shutil
+from typing import List
+from sqlalchemy.orm import Session
+from ..db.connection import SessionLocal
+from ..models.database import Collection, Document, Tombstone
+from .retrieval import RetrievalService
+
+class DeletionService:
+    """
+    Deletes documents and collections in two steps: a tombstone hides the data from
+    searches right away, then purge() removes the vectors and uploaded files.
+    """
+    def __init__(self, retrieval_service: RetrievalService, upload_root: str = "uploads"):
+        self.retrieval_service = retrieval_service
+        self.upload_root = upload_root
+
+    def tombstone_document(self, db: Session, doc: Document) -> str:
+        tombstone = Tombstone(
+            kind="document",
+            target_id=doc.id,
+            collection_id=doc.collection_id,
+            filename=doc.filename
+        )
+        return self._tombstone(db, tombstone, doc)
+
+    def tombstone_collection(self, db: Session, collection: Collection) -> str:
+        tombstone = Tombstone(kind="collection", target_id=collection.id, collection_id=collection.id)
+        # Documents and messages go with it via the ORM cascade
+        return self._tombstone(db, tombstone, collection)
+
+    def purge(self, tombstone_id: str) -> int:
+        """
+        Remove the vectors and uploads behind a tombstone, then drop it.
+        Returns the number of vectors deleted.
+        """
+        with SessionLocal() as db:
+            tombstone = db.query(Tombstone).filter(Tombstone.id == tombstone_id).first()
+            if not tombstone:
+                return 0
+
+            if tombstone.kind == "collection":
+                removed = self.retrieval_service.delete_vectors(tombstone.collection_id)
+                shutil.rmtree(os.path.join(self.upload_root, tombstone.collection_id), ignore_errors=True)
+            else:
+                removed = self.retrieval_service.delete_vectors(tombstone.collection_id, source_doc_id=tombstone.target_id)
+                # Uploads are stored by filename, so keep the file if another document still uses it
+                still_used = db.query(Document).filter(
+                    Document.collection_id == tombstone.collection_id,
+                    Document.filename == tombstone.filename
+                ).first()
+                file_path = os.path.join(self.upload_root, tombstone.collection_id, tombstone.filename)
+                if not still_used and os.path.exists(file_path):
+                    os.remove(file_path)
+
+            self.retrieval_service.remove_tombstone(tombstone.kind, tombstone.target_id, tombstone.collection_id)
+            db.delete(tombstone)
+            db.commit()
+            print(f"Purged {removed} vectors for {tombstone.kind} {tombstone.target_id}")
+            return removed
+
+    def resume(self) -> List[str]:
+        """
+        Re-apply tombstones left behind by an interrupted purge. Returns their ids so
+        the caller can purge them again.
+        """
+        with SessionLocal() as db:
+            tombstones = db.query(Tombstone).all()
+            for tombstone in tombstones:
+                self.retrieval_service.add_tombstone(tombstone.kind, tombstone.target_id, tombstone.collection_id)
+            return [t.id for t in tombstones]
+
+    def _tombstone(self, db: Session, tombstone: Tombstone, target) -> str:
+        db.add(tombstone)
+        db.delete(target)
+        db.commit()
+        self.retrieval_service.add_tombstone(tombstone.kind, tombstone.target_id, tombstone.collection_id)
+        return tombstone.id
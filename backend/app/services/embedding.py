@@ -16,3 +16,14 @@ class EmbeddingService:
         # encode returns a numpy array, convert to list for JSON/Chroma validation
         embedding = self.model.encode(text)
         return embedding.tolist()
+
+    def generate_embeddings(self, texts: List[str], batch_size: int = 64) -> List[List[float]]:
+        """
+        Generate embeddings for many texts in batched forward passes.
+        """
+        if not texts:
+            return []
+
+        # One encode call batches the texts through the model instead of one pass per text
+        embeddings = self.model.encode(texts, batch_size=batch_size)
+        return embeddings.tolist()
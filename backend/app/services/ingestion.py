@@ -1,9 +1,16 @@
+import bisect
+import multiprocessing
 import os
+import re
+import threading
+import zipfile
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+from xml.etree import ElementTree
 from .chunking import RecursiveCharacterTextSplitter
 import PyPDF2
-from docx import Document as DocxDocument
 import typing
 
 # Define the output object structure
@@ -11,11 +18,84 @@ class IngestedChunk(typing.TypedDict):
     text: str
     metadata: Dict[str, Any]
 
+class IngestedUnit(IngestedChunk, total=False):
+    # (offset in text, locator) of each block, so every split can be located by the block it starts in
+    anchors: List[Tuple[int, Dict[str, Any]]]
+
+# Sections longer than this are cut into several units so no single unit
+# (and no single splitter call) has to hold a whole document in memory.
+MAX_UNIT_CHARS = 16_000
+
+# Text files are read at most this many characters at a time, so a file without
+# newlines is never read into memory as a single line
+READ_BLOCK_CHARS = 8192
+
+# WordprocessingML namespace, as it appears in ElementTree tags
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+MARKDOWN_HEADING = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+
 class BaseParser(ABC):
     @abstractmethod
     def parse(self, file_path: str, source_doc_id: str) -> List[IngestedChunk]:
         pass
 
+    def iter_units(self, file_path: str, source_doc_id: str) -> Iterator[IngestedChunk]:
+        """
+        Yield parsed units one at a time. Parsers that can stream override this.
+        """
+        yield from self.parse(file_path, source_doc_id)
+
+class _UnitBuilder:
+    """
+    Accumulates the blocks of the current section and emits them as one unit
+    when the section ends, the page changes, or it would grow past max_chars.
+    """
+    def __init__(self, source_doc_id: str, max_chars: int = MAX_UNIT_CHARS):
+        self.source_doc_id = source_doc_id
+        self.max_chars = max_chars
+        self.section = ""
+        self.blocks: List[str] = []
+        self.size = 0
+        self.anchors: List[Tuple[int, Dict[str, Any]]] = []
+
+    def start_section(self, title: str) -> Optional[IngestedUnit]:
+        unit = self.flush()
+        self.section = title
+        return unit
+
+    def add(self, text: str, **locator: Any) -> Optional[IngestedUnit]:
+        if not text.strip():
+            return None
+        unit = None
+        # Keep units on one page and under max_chars
+        if self.blocks and (
+            locator.get("page_number") != self.anchors[-1][1].get("page_number")
+            or self.size + len(text) > self.max_chars
+        ):
+            unit = self.flush()
+        self.anchors.append((self.size, locator))
+        self.blocks.append(text)
+        self.size += len(text) + 2
+        return unit
+
+    def flush(self) -> Optional[IngestedUnit]:
+        if not self.blocks:
+            return None
+        unit: IngestedUnit = {
+            "text": "\n\n".join(self.blocks),
+            "metadata": {
+                "source_doc_id": self.source_doc_id,
+                "section": self.section,
+                **self.anchors[0][1]
+            },
+            "anchors": self.anchors
+        }
+        self.blocks = []
+        self.size = 0
+        self.anchors = []
+        return unit
+
 class PDFParser(BaseParser):
     def parse(self, file_path: str, source_doc_id: str) -> List[IngestedChunk]:
         chunks: List[IngestedChunk] = []
@@ -25,14 +105,14 @@ class PDFParser(BaseParser):
                 for page_num, page in enumerate(reader.pages):
                     text = page.extract_text()
                     if text:
-                        # We return partial chunks (pages) to be split further? 
+                        # We return partial chunks (pages) to be split further?
                         # Or do we treat the whole doc as one?
                         # User requirement: "output of the ingestion service is a list of objects containing the chunk text and metadata (source_doc_id, page_number)"
                         # So we should probably preserve page numbers if we can.
                         chunks.append({
                             "text": text,
                             "metadata": {
-                                "source_doc_id": source_doc_id, 
+                                "source_doc_id": source_doc_id,
                                 "page_number": page_num + 1
                             }
                         })
@@ -41,48 +121,187 @@ class PDFParser(BaseParser):
         return chunks
 
 class DocxParser(BaseParser):
+    """
+    Streams word/document.xml straight out of the archive with iterparse instead of
+    loading the whole DOM, emitting one unit per heading-scoped section.
+    """
     def parse(self, file_path: str, source_doc_id: str) -> List[IngestedChunk]:
-        chunks: List[IngestedChunk] = []
+        return list(self.iter_units(file_path, source_doc_id))
+
+    def iter_units(self, file_path: str, source_doc_id: str) -> Iterator[IngestedChunk]:
         try:
-            doc = DocxDocument(file_path)
-            # DOCX doesn't have strict "pages" like PDF. We'll treat paragraphs or the whole thing.
-            # To provide granular metadata, we might group paragraphs? 
-            # For simplicity, we'll extract all text and set page_number to 1 (or 0).
-            full_text = "\n".join([para.text for para in doc.paragraphs])
-            chunks.append({
-                "text": full_text,
-                "metadata": {
-                    "source_doc_id": source_doc_id,
-                    "page_number": 1 # DOCX flowable
-                }
-            })
+            with zipfile.ZipFile(file_path) as archive, archive.open("word/document.xml") as xml:
+                yield from self._walk_body(xml, source_doc_id)
         except Exception as e:
             print(f"Error parsing DOCX {file_path}: {e}")
-        return chunks
+
+    def _walk_body(self, xml, source_doc_id: str) -> Iterator[IngestedChunk]:
+        builder = _UnitBuilder(source_doc_id)
+        body = None
+        depth = 0
+        page_number = 1
+        block_page = 1
+        rendered_breaks_seen = False
+        block_has_text = False
+        paragraph_index = 0
+
+        for event, elem in ElementTree.iterparse(xml, events=("start", "end")):
+            if event == "start":
+                depth += 1
+                if elem.tag == W + "body":
+                    body = elem
+                elif depth == 3:
+                    # A top-level block (paragraph or table) starts on the current page
+                    block_page = page_number
+                    block_has_text = False
+                continue
+
+            depth -= 1
+            tag = elem.tag
+
+            # DOCX has no fixed pages. Word records where it last rendered a page break;
+            # fall back to explicit page breaks for files that were never laid out.
+            if tag == W + "t" and elem.text:
+                block_has_text = True
+            elif tag == W + "lastRenderedPageBreak" or (
+                tag == W + "br" and elem.get(W + "type") == "page" and not rendered_breaks_seen
+            ):
+                rendered_breaks_seen = rendered_breaks_seen or tag == W + "lastRenderedPageBreak"
+                page_number += 1
+                if not block_has_text:
+                    # The break comes before any text, so the whole block is on the new page
+                    block_page = page_number
+                continue
+
+            # Only act once a direct child of <w:body> is complete
+            if body is None or depth != 2:
+                continue
+
+            unit = None
+            if tag == W + "p":
+                paragraph_index += 1
+                text = _docx_paragraph_text(elem)
+                if _docx_is_heading(elem) and text.strip():
+                    unit = builder.start_section(text.strip())
+                    if unit:
+                        yield unit
+                unit = builder.add(text, page_number=block_page, paragraph=paragraph_index)
+            elif tag == W + "tbl":
+                unit = builder.add(_docx_table_text(elem), page_number=block_page, paragraph=paragraph_index)
+
+            if unit:
+                yield unit
+            # Drop the finished block so memory stays flat
+            body.clear()
+
+        unit = builder.flush()
+        if unit:
+            yield unit
+
+def _docx_paragraph_text(paragraph: ElementTree.Element) -> str:
+    parts = []
+    for node in paragraph.iter():
+        if node.tag == W + "t":
+            parts.append(node.text or "")
+        elif node.tag == W + "tab":
+            parts.append("\t")
+        elif node.tag in (W + "br", W + "cr") and node.get(W + "type") != "page":
+            parts.append("\n")
+    return "".join(parts)
+
+def _docx_is_heading(paragraph: ElementTree.Element) -> bool:
+    props = paragraph.find(W + "pPr")
+    if props is None:
+        return False
+    if props.find(W + "outlineLvl") is not None:
+        return True
+    style = props.find(W + "pStyle")
+    style_id = style.get(W + "val", "") if style is not None else ""
+    return style_id.startswith("Heading") or style_id == "Title"
+
+def _docx_table_text(table: ElementTree.Element) -> str:
+    # One line per row, cells separated by pipes
+    rows = []
+    for row in table.iter(W + "tr"):
+        cells = [
+            " ".join(_docx_paragraph_text(p).strip() for p in cell.iter(W + "p")).strip()
+            for cell in row.findall(W + "tc")
+        ]
+        if any(cells):
+            rows.append(" | ".join(cells))
+    return "\n".join(rows)
 
 class TextParser(BaseParser):
+    """
+    Reads text line by line, in bounded pieces. Markdown files are scoped by their ATX
+    headings; plain text is cut into units at paragraph boundaries.
+    """
     def parse(self, file_path: str, source_doc_id: str) -> List[IngestedChunk]:
-        chunks: List[IngestedChunk] = []
+        return list(self.iter_units(file_path, source_doc_id))
+
+    def iter_units(self, file_path: str, source_doc_id: str) -> Iterator[IngestedChunk]:
+        is_markdown = file_path.lower().endswith(".md")
+        builder = _UnitBuilder(source_doc_id)
+        paragraph: List[str] = []
+        paragraph_size = 0
+        paragraph_line = 1
+        in_fence = False
+        line_number = 1
+        at_line_start = True
+
         try:
             with open(file_path, 'r', encoding='utf-8') as f:
-                text = f.read()
-                chunks.append({
-                   "text": text,
-                   "metadata": {
-                       "source_doc_id": source_doc_id,
-                       "page_number": 1
-                   }
-                })
+                while True:
+                    # A line longer than READ_BLOCK_CHARS comes back in several pieces
+                    line = f.readline(READ_BLOCK_CHARS)
+                    if not line:
+                        break
+                    whole_line = at_line_start and (line.endswith("\n") or len(line) < READ_BLOCK_CHARS)
+                    stripped = line.strip()
+                    if whole_line and is_markdown and stripped.startswith("```"):
+                        in_fence = not in_fence
+                    heading = MARKDOWN_HEADING.match(stripped) if whole_line and is_markdown and not in_fence else None
+
+                    # Paragraph ends at a blank line, a heading, or when it gets too long
+                    if heading or (whole_line and not stripped) or paragraph_size >= builder.max_chars:
+                        unit = builder.add("".join(paragraph).rstrip("\n"), page_number=1, line_number=paragraph_line)
+                        if unit:
+                            yield unit
+                        paragraph = []
+                        paragraph_size = 0
+
+                    if heading:
+                        unit = builder.start_section(heading.group(2))
+                        if unit:
+                            yield unit
+                        unit = builder.add(stripped, page_number=1, line_number=line_number)
+                        if unit:
+                            yield unit
+                    elif stripped or not whole_line:
+                        if not paragraph:
+                            paragraph_line = line_number
+                        paragraph.append(line)
+                        paragraph_size += len(line)
+
+                    at_line_start = line.endswith("\n")
+                    if at_line_start:
+                        line_number += 1
+
+                unit = builder.add("".join(paragraph).rstrip("\n"), page_number=1, line_number=paragraph_line)
+                if unit:
+                    yield unit
+                unit = builder.flush()
+                if unit:
+                    yield unit
         except Exception as e:
             print(f"Error parsing Text {file_path}: {e}")
-        return chunks
 
 class ParserFactory:
     @staticmethod
     def get_parser(file_path: str) -> BaseParser:
         _, ext = os.path.splitext(file_path)
         ext = ext.lower()
-        
+
         if ext == '.pdf':
             return PDFParser()
         elif ext == '.docx':
@@ -92,26 +311,81 @@ class ParserFactory:
         else:
             raise ValueError(f"Unsupported file type: {ext}")
 
+def _split_text(chunk_size: int, chunk_overlap: int, text: str) -> List[str]:
+    # Module-level so it can be pickled into worker processes
+    return RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap).split_text(text)
+
 class IngestionService:
-    def __init__(self):
+    def __init__(self, max_workers: Optional[int] = None):
         self.chunker = RecursiveCharacterTextSplitter(chunk_size=512, chunk_overlap=102)
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # Concurrent ingests run in the threadpool and may ask for the pool at the same time
+        self._executor_lock = threading.Lock()
 
     def ingest(self, file_path: str, source_doc_id: str) -> List[IngestedChunk]:
+        return list(self.iter_ingest(file_path, source_doc_id))
+
+    def iter_ingest(self, file_path: str, source_doc_id: str) -> Iterator[IngestedChunk]:
+        """
+        Stream split chunks in document order.
+        Units are split in parallel worker processes, with at most a small window of
+        units in flight so memory stays flat regardless of document size.
+        """
         parser = ParserFactory.get_parser(file_path)
-        # 1. Parse raw text-chunks (pages or full docs)
-        raw_chunks = parser.parse(file_path, source_doc_id)
-        
-        final_output: List[IngestedChunk] = []
-        
+        # 1. Parse raw units (pages or sections) lazily
+        units = parser.iter_units(file_path, source_doc_id)
+
         # 2. Split into smaller chunks
-        for raw in raw_chunks:
-            splits = self.chunker.split_text(raw['text'])
-            base_metadata = raw['metadata']
-            
-            for split in splits:
-                final_output.append({
-                    "text": split,
-                    "metadata": base_metadata # Inherit metadata (e.g. page number)
-                })
-                
-        return final_output
+        if self.max_workers <= 1:
+            for unit in units:
+                yield from self._to_chunks(unit, self.chunker.split_text(unit["text"]))
+            return
+
+        executor = self._get_executor()
+        pending = deque()
+        for unit in units:
+            future = executor.submit(_split_text, self.chunker.chunk_size, self.chunker.chunk_overlap, unit["text"])
+            pending.append((unit, future))
+            if len(pending) >= self.max_workers * 2:
+                unit, future = pending.popleft()
+                yield from self._to_chunks(unit, future.result())
+
+        while pending:
+            unit, future = pending.popleft()
+            yield from self._to_chunks(unit, future.result())
+
+    def _to_chunks(self, unit: IngestedUnit, splits: List[str]) -> Iterator[IngestedChunk]:
+        """
+        Give each split the unit's metadata (e.g. page number, section) plus the locator
+        of the block it starts in. Splits are substrings of the unit text, in order.
+        """
+        text = unit["text"]
+        anchors = unit.get("anchors") or [(0, {})]
+        starts = [offset for offset, _ in anchors]
+        cursor = 0
+        for split in splits:
+            start = text.find(split, cursor)
+            if start < 0:
+                start = cursor
+            # The next split only repeats up to chunk_overlap characters of this one
+            cursor = max(start + len(split) - self.chunker.chunk_overlap, 0)
+            block_start, locator = anchors[max(bisect.bisect_right(starts, start) - 1, 0)]
+            metadata = {**unit["metadata"], **locator}
+            if "line_number" in locator:
+                # Lines inside a block are kept as-is, so count the ones before the split
+                metadata["line_number"] = locator["line_number"] + text.count("\n", block_start, start)
+            yield {
+                "text": split,
+                "metadata": metadata
+            }
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                # Forking a server that already runs torch and Chroma threads can deadlock the child
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
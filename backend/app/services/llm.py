@@ -29,14 +29,23 @@ class LLMService:
             meta = chunk.get("metadata", {})
             src_id = meta.get("source_doc_id", "unknown")
             page = meta.get("page_number", "?")
-            key = f"{src_id}_{page}"
+            section = meta.get("section", "")
+            # Text files are located by line, DOCX by paragraph; PDFs have neither
+            line = meta.get("line_number")
+            paragraph = meta.get("paragraph")
+            key = f"{src_id}_{page}_{section}_{line}_{paragraph}"
             
             if key not in sources:
-                snippet = chunk.get("text", "")[:80].replace("\n", " ") + "..."
+                # Chunks from the chunk store carry a precomputed snippet
+                snippet = chunk.get("snippet") or chunk.get("text", "")[:80].replace("\n", " ") + "..."
                 sources[key] = {
                     "source_doc_id": src_id,
                     "page_number": page,
+                    "section": section,
+                    "line_number": line,
+                    "paragraph": paragraph,
                     "filename": meta.get("filename", f"doc-{src_id}"),
+                    "collection_id": meta.get("collection_id"),
                     "snippet": snippet
                 }
         return list(sources.values())
@@ -1,49 +1,599 @@
 import chromadb
-from typing import List, Dict, Any
+import heapq
+import os
+import sqlite3
+import threading
+import uuid
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Tuple, Optional
 from .embedding import EmbeddingService
+from .chunk_store import ChunkStore, SNIPPET_CHARS
+from ..config import settings
+from ..models.schemas import IndexParams
+
+# Rank constant for reciprocal rank fusion (the value used in the original RRF paper)
+RRF_K = 60
+
+# Upper bound of each distance function, used to map raw distances onto [0, 1].
+# Embeddings are unit-normalized, so squared L2 tops out at 4 and cosine distance at 2.
+DISTANCE_RANGES = {"l2": 4.0, "cosine": 2.0, "ip": 2.0}
+
+# Number of vectors fetched per round trip when purging or compacting
+PURGE_BATCH_SIZE = 5000
+
+COLLECTION_NAME = "rag_vectors"
+
+# Name suffix the live index is parked under while compaction swaps in its rebuilt copy
+BACKUP_SUFFIX = "_backup"
+
+# Chunk store state key set once every record indexed before the chunk store has been moved into it
+LEGACY_MIGRATED_KEY = "legacy_migrated"
+
+def hnsw_metadata(params: IndexParams) -> Dict[str, Any]:
+    """
+    Chroma collection metadata that applies the given HNSW settings.
+    """
+    return {
+        "hnsw:space": params.space,
+        "hnsw:construction_ef": params.construction_ef,
+        "hnsw:M": params.M,
+        "hnsw:search_ef": params.search_ef
+    }
 
 class RetrievalService:
-    def __init__(self, persist_dir: str = "./chroma_db"):
+    def __init__(self, persist_dir: str = "./chroma_db", max_workers: int = 8):
+        self.persist_dir = persist_dir
         self.client = chromadb.PersistentClient(path=persist_dir)
         # Using a single collection for all data, utilizing metadata for filtering
-        self.collection = self.client.get_or_create_collection(name="rag_vectors")
+        self.collection = self._open_index(COLLECTION_NAME)
         self.embedding_service = EmbeddingService()
+        # Chunk text and citation data live here; the index only keeps integer refs
+        self.chunk_store = ChunkStore(persist_dir)
+        # Collections tuned with their own HNSW settings get a dedicated index
+        self._indexes: Dict[str, Any] = {
+            collection_id: self._open_index(name, hnsw_metadata(IndexParams(**params)))
+            for collection_id, (name, params) in self.chunk_store.indexes().items()
+        }
+        # Shared pool for fanning out per-collection searches
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        # Deleted data whose vectors are still being purged; searches skip it
+        self._tombstone_lock = threading.Lock()
+        self._deleted_collections: set = set()
+        self._deleted_documents: Dict[str, set] = {}
+        # Writes to a collection and rebuilds of its index are serialized per collection,
+        # so no chunk lands in an index that is about to be dropped
+        self._write_locks: Dict[str, threading.Lock] = {}
+        self._write_locks_guard = threading.Lock()
+        # Collections whose index is being rebuilt, with the params being applied
+        self.rebuilds: Dict[str, IndexParams] = {}
+        # Records indexed before the chunk store keep their text and ids in Chroma until
+        # migrate_legacy() moves them over; searches read them in place meanwhile
+        self.legacy_pending = self.chunk_store.get_state(LEGACY_MIGRATED_KEY) is None
+        if self.legacy_pending and self.collection.count() == 0:
+            self._mark_legacy_migrated()
 
     def add_texts(self, texts: List[str], metadatas: List[Dict[str, Any]], ids: List[str]):
         """
         Add texts to the vector store.
         """
-        embeddings = [self.embedding_service.generate_embedding(text) for text in texts]
-        self.collection.add(
-            documents=texts,
-            embeddings=embeddings,
-            metadatas=metadatas,
-            ids=ids
-        )
+        embeddings = self.embedding_service.generate_embeddings(texts)
+        vector_metadatas = self.chunk_store.add(ids, texts, metadatas)
+
+        # Route each chunk to its collection's index
+        positions_by_collection: Dict[str, List[int]] = {}
+        for pos, meta in enumerate(metadatas):
+            positions_by_collection.setdefault(str(meta.get("collection_id", "")), []).append(pos)
 
-    def search(self, collection_id: str, query: str, top_k: int = 4) -> List[Dict[str, Any]]:
+        for collection_id, positions in positions_by_collection.items():
+            with self._write_lock(collection_id):
+                self._index_for(collection_id).add(
+                    embeddings=[embeddings[pos] for pos in positions],
+                    metadatas=[vector_metadatas[pos] for pos in positions],
+                    ids=[ids[pos] for pos in positions]
+                )
+
+    def search(self, collection_id: str, query: str, top_k: Optional[int] = None) -> List[Dict[str, Any]]:
         """
         Search for relevant chunks within a specific collection context.
         """
+        top_k = top_k or settings.RETRIEVAL_TOP_K
         query_embedding = self.embedding_service.generate_embedding(query)
-        
-        results = self.collection.query(
+
+        where = self._where(collection_id)
+        if where is None:
+            return []
+
+        results = self._index_for(collection_id).query(
             query_embeddings=[query_embedding],
             n_results=top_k,
-            where={"collection_id": collection_id} # Namespace filtering
+            where=where, # Namespace filtering
+            include=self._include() # Text and metadata come from the chunk store
         )
-        
-        # Chroma returns lists of lists (columns), let's reshape to list of dicts
+
+        return self._format_results(results)[0]
+
+    def search_many(
+        self,
+        queries: List[Tuple[str, str]],
+        top_k: Optional[int] = None,
+        fuse: bool = False
+    ) -> List[Any]:
+        """
+        Search for many (collection_id, query) pairs at once.
+        All queries are embedded in a single batch and each collection is hit with one
+        vectorized query call. Returns one result list per input, in input order, or a
+        single reciprocal-rank-fused list when fuse=True (for query expansion).
+        """
+        if not queries:
+            return []
+        top_k = top_k or settings.RETRIEVAL_TOP_K
+
+        query_embeddings = self.embedding_service.generate_embeddings([q for _, q in queries])
+
+        # Group input positions by collection so each namespace is queried once
+        positions_by_collection: Dict[str, List[int]] = {}
+        for pos, (collection_id, _) in enumerate(queries):
+            positions_by_collection.setdefault(collection_id, []).append(pos)
+
+        per_query: List[List[Dict[str, Any]]] = [[] for _ in queries]
+        for collection_id, positions in positions_by_collection.items():
+            where = self._where(collection_id)
+            if where is None:
+                continue
+            results = self._index_for(collection_id).query(
+                query_embeddings=[query_embeddings[pos] for pos in positions],
+                n_results=top_k,
+                where=where,
+                include=self._include()
+            )
+            for pos, items in zip(positions, self._format_results(results)):
+                per_query[pos] = items
+
+        if fuse:
+            return self._fuse_results(per_query, top_k)
+        return per_query
+
+    def search_collections(self, collection_ids: List[str], query: str, top_k: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Search several collections for one query and return the global top_k.
+        The query is embedded once, the per-collection searches run in parallel and the
+        hits are merged with a heap over normalized distances.
+        """
+        # De-duplicate while keeping the caller's order
+        collection_ids = list(dict.fromkeys(collection_ids))
+        if not collection_ids:
+            return []
+        top_k = top_k or settings.RETRIEVAL_TOP_K
+
+        query_embedding = self.embedding_service.generate_embedding(query)
+        if len(collection_ids) == 1:
+            return self._search_embedding(collection_ids[0], query_embedding, top_k)
+
+        futures = [
+            self.executor.submit(self._search_embedding, collection_id, query_embedding, top_k)
+            for collection_id in collection_ids
+        ]
+        hits = [item for future in futures for item in future.result()]
+
+        return heapq.nsmallest(top_k, hits, key=lambda item: item["normalized_distance"])
+
+    def _search_embedding(self, collection_id: str, query_embedding: List[float], top_k: int) -> List[Dict[str, Any]]:
+        where = self._where(collection_id)
+        if where is None:
+            return []
+        index = self._index_for(collection_id)
+        results = index.query(
+            query_embeddings=[query_embedding],
+            n_results=top_k,
+            where=where,
+            include=self._include()
+        )
+        items = self._format_results(results)[0]
+        space = (index.metadata or {}).get("hnsw:space", "l2")
+        for item in items:
+            item["normalized_distance"] = self._normalize_distance(item["distance"], space)
+        return items
+
+    # --- Index Tuning ---
+
+    def get_index_params(self, collection_id: str) -> IndexParams:
+        index = self._index_for(collection_id)
+        metadata = index.metadata or {}
+        defaults = IndexParams()
+        return IndexParams(
+            space=metadata.get("hnsw:space", defaults.space),
+            construction_ef=metadata.get("hnsw:construction_ef", defaults.construction_ef),
+            M=metadata.get("hnsw:M", defaults.M),
+            search_ef=metadata.get("hnsw:search_ef", defaults.search_ef)
+        )
+
+    def configure_index(self, collection_id: str, params: IndexParams, batch_size: int = PURGE_BATCH_SIZE) -> int:
+        """
+        Give a collection a dedicated index built with `params`, copying its existing vectors
+        over. HNSW settings are fixed at build time, so every change is a rebuild. Searches keep
+        using the old index until the copy is done; writes to the collection wait for it.
+        Returns the number of vectors moved.
+        """
+        try:
+            with self._write_lock(collection_id):
+                return self._rebuild_collection(collection_id, params, batch_size)
+        finally:
+            self.rebuilds.pop(collection_id, None)
+
+    def start_rebuild(self, collection_id: str, params: IndexParams) -> bool:
+        """
+        Record a rebuild that is about to run in the background. Returns False if the
+        collection already has one in progress.
+        """
+        with self._write_locks_guard:
+            if collection_id in self.rebuilds:
+                return False
+            self.rebuilds[collection_id] = params
+            return True
+
+    def _rebuild_collection(self, collection_id: str, params: IndexParams, batch_size: int) -> int:
+        # Caller holds the collection's write lock
+        old_index = self._index_for(collection_id)
+        name = f"{COLLECTION_NAME}_{uuid.uuid4().hex[:12]}"
+        new_index = self.client.create_collection(name=name, metadata=hnsw_metadata(params))
+
+        moved = 0
+        collection_ref = self.chunk_store.ref(collection_id)
+        try:
+            if collection_ref is not None:
+                where = {"collection_ref": collection_ref}
+                while True:
+                    batch = old_index.get(where=where, limit=batch_size, offset=moved, include=["embeddings", "metadatas"])
+                    if not batch["ids"]:
+                        break
+                    new_index.add(ids=batch["ids"], embeddings=batch["embeddings"], metadatas=batch["metadatas"])
+                    moved += len(batch["ids"])
+            self.chunk_store.set_index(collection_id, name, params.model_dump())
+        except Exception as e:
+            # The old index is untouched; drop the partial copy so failed rebuilds leave nothing behind
+            print(f"Rebuilding index for collection {collection_id} failed: {e}")
+            self.client.delete_collection(name)
+            raise
+        self._indexes[collection_id] = new_index
+
+        # Only now drop the old copies
+        if old_index is self.collection:
+            if collection_ref is not None:
+                _delete_where(self.collection, {"collection_ref": collection_ref}, batch_size)
+        else:
+            self.client.delete_collection(old_index.name)
+        return moved
+
+    def _index_for(self, collection_id: str):
+        return self._indexes.get(collection_id, self.collection)
+
+    def _write_lock(self, collection_id: str) -> threading.Lock:
+        with self._write_locks_guard:
+            return self._write_locks.setdefault(collection_id, threading.Lock())
+
+    # --- Deletion ---
+
+    def add_tombstone(self, kind: str, target_id: str, collection_id: str):
+        """
+        Hide a deleted document or collection from searches until its vectors are purged.
+        """
+        with self._tombstone_lock:
+            if kind == "collection":
+                self._deleted_collections.add(target_id)
+            else:
+                self._deleted_documents.setdefault(collection_id, set()).add(target_id)
+
+    def remove_tombstone(self, kind: str, target_id: str, collection_id: str):
+        with self._tombstone_lock:
+            if kind == "collection":
+                self._deleted_collections.discard(target_id)
+            else:
+                doc_ids = self._deleted_documents.get(collection_id, set())
+                doc_ids.discard(target_id)
+                if not doc_ids:
+                    self._deleted_documents.pop(collection_id, None)
+
+    def delete_vectors(
+        self,
+        collection_id: str,
+        source_doc_id: Optional[str] = None,
+        batch_size: int = PURGE_BATCH_SIZE
+    ) -> int:
+        """
+        Delete every chunk of a collection, or of one of its documents when source_doc_id
+        is given, in batches of ids from the chunk store. Returns the number deleted.
+        """
+        with self._write_lock(collection_id):
+            return self._delete_vectors(collection_id, source_doc_id, batch_size)
+
+    def _delete_vectors(self, collection_id: str, source_doc_id: Optional[str], batch_size: int) -> int:
+        # Caller holds the collection's write lock
+        index = self._index_for(collection_id)
+        whole_collection = source_doc_id is None
+        if whole_collection and index is not self.collection:
+            # A dedicated index holds nothing else, so drop it in one go
+            self.client.delete_collection(index.name)
+            self.chunk_store.remove_index(collection_id)
+            self._indexes.pop(collection_id, None)
+            index = None
+
+        deleted = 0
+        while True:
+            if whole_collection:
+                ids = self.chunk_store.chunk_ids(collection_id=collection_id, limit=batch_size)
+            else:
+                ids = self.chunk_store.chunk_ids(source_doc_id=source_doc_id, limit=batch_size)
+            if not ids:
+                break
+            if index is not None:
+                index.delete(ids=ids)
+            self.chunk_store.delete(ids)
+            deleted += len(ids)
+
+        # Vectors indexed before the chunk store carry their ids in metadata
+        legacy_where = {"collection_id": collection_id} if whole_collection else {"source_doc_id": source_doc_id}
+        self.collection.delete(where=legacy_where)
+        return deleted
+
+    def compact(self, batch_size: int = PURGE_BATCH_SIZE) -> Dict[str, Any]:
+        """
+        Rebuild every vector index from its live records to reclaim the space left behind by
+        deletes (HNSW only marks deleted elements). Records indexed before the chunk store
+        existed are moved into it on the way. Not safe to run while the API is serving.
+        """
+        bytes_before = dir_size(self.persist_dir)
+
+        self.collection, copied = self._rebuild_index(self.collection, batch_size)
+        for collection_id, index in list(self._indexes.items()):
+            self._indexes[collection_id], count = self._rebuild_index(index, batch_size)
+            copied += count
+        self._mark_legacy_migrated()
+
+        # Chroma's SQLite store keeps freed pages around until it is vacuumed
+        sqlite_path = os.path.join(self.persist_dir, "chroma.sqlite3")
+        if os.path.exists(sqlite_path):
+            with closing(sqlite3.connect(sqlite_path)) as conn:
+                conn.execute("VACUUM")
+        self.chunk_store.vacuum()
+
+        bytes_after = dir_size(self.persist_dir)
+        return {
+            "vectors": copied,
+            "bytes_before": bytes_before,
+            "bytes_after": bytes_after,
+            "bytes_reclaimed": bytes_before - bytes_after
+        }
+
+    def _rebuild_index(self, index, batch_size: int):
+        """
+        Copy an index's live records into a fresh collection with the same settings and
+        swap it in under the same name. Returns (new index, records copied).
+        """
+        name = index.name
+        staging_name = f"{name}_compact"
+        backup_name = f"{name}{BACKUP_SUFFIX}"
+
+        # Clear leftovers from an interrupted run; the live index is intact at this point
+        for leftover in (staging_name, backup_name):
+            try:
+                self.client.delete_collection(leftover)
+            except Exception:
+                pass
+        staging = self.client.create_collection(name=staging_name, metadata=index.metadata)
+
+        copied = 0
+        while True:
+            batch = index.get(
+                limit=batch_size,
+                offset=copied,
+                include=["embeddings", "documents", "metadatas"]
+            )
+            if not batch["ids"]:
+                break
+            # The rebuilt index keeps only the refs, whatever older versions stored
+            metadatas = [
+                {"collection_ref": meta["collection_ref"], "doc_ref": meta["doc_ref"]} if "collection_ref" in meta else None
+                for meta in batch["metadatas"]
+            ]
+            legacy = [i for i, meta in enumerate(metadatas) if meta is None]
+            if legacy:
+                converted = self.chunk_store.add(
+                    [batch["ids"][i] for i in legacy],
+                    [batch["documents"][i] or "" for i in legacy],
+                    [batch["metadatas"][i] for i in legacy]
+                )
+                for i, meta in zip(legacy, converted):
+                    metadatas[i] = meta
+            staging.add(
+                ids=batch["ids"],
+                embeddings=batch["embeddings"],
+                metadatas=metadatas
+            )
+            copied += len(batch["ids"])
+
+        # Swap by renaming so a full copy always exists under some name;
+        # _open_index() restores the backup if we die between the two renames
+        index.modify(name=backup_name)
+        staging.modify(name=name)
+        self.client.delete_collection(backup_name)
+        return self.client.get_collection(name=name), copied
+
+    def _open_index(self, name: str, metadata: Optional[Dict[str, Any]] = None):
+        backup_name = f"{name}{BACKUP_SUFFIX}"
+        if not self._index_exists(name) and self._index_exists(backup_name):
+            print(f"Restoring index {name} from an interrupted compaction")
+            self.client.get_collection(name=backup_name).modify(name=name)
+        return self.client.get_or_create_collection(name=name, metadata=metadata)
+
+    def _index_exists(self, name: str) -> bool:
+        try:
+            self.client.get_collection(name=name)
+            return True
+        except Exception:
+            return False
+
+    def migrate_legacy(self, batch_size: int = PURGE_BATCH_SIZE) -> int:
+        """
+        Move records indexed before the chunk store existed into it, in place: their text
+        and citation data go to the chunk store and their vector metadata becomes refs.
+        Safe to run while serving. Returns the number of records migrated.
+        """
+        migrated = 0
+        offset = 0
+        while self.legacy_pending:
+            batch = self.collection.get(
+                limit=batch_size,
+                offset=offset,
+                include=["embeddings", "documents", "metadatas"]
+            )
+            if not batch["ids"]:
+                break
+            legacy = [i for i, meta in enumerate(batch["metadatas"]) if "collection_ref" not in meta]
+            if legacy:
+                ids = [batch["ids"][i] for i in legacy]
+                converted = self.chunk_store.add(
+                    ids,
+                    [batch["documents"][i] or "" for i in legacy],
+                    [batch["metadatas"][i] for i in legacy]
+                )
+                # Chroma merges metadata on update, so the old keys are dropped by setting them
+                # to None. The text now lives in the chunk store; clearing the document needs the
+                # embeddings passed back, or Chroma would re-embed the empty string
+                self.collection.update(
+                    ids=ids,
+                    embeddings=[batch["embeddings"][i] for i in legacy],
+                    metadatas=[
+                        {**{key: None for key in batch["metadatas"][i]}, **refs}
+                        for i, refs in zip(legacy, converted)
+                    ],
+                    documents=[""] * len(ids)
+                )
+                migrated += len(ids)
+            offset += len(batch["ids"])
+        self._mark_legacy_migrated()
+        return migrated
+
+    def _mark_legacy_migrated(self):
+        self.chunk_store.set_state(LEGACY_MIGRATED_KEY, "1")
+        self.legacy_pending = False
+
+    def _where(self, collection_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Metadata filter for one collection, excluding tombstoned documents.
+        Returns None when there is nothing to search (deleted or never indexed).
+        """
+        with self._tombstone_lock:
+            if collection_id in self._deleted_collections:
+                return None
+            deleted_docs = list(self._deleted_documents.get(collection_id, ()))
+        clauses = []
+        collection_ref = self.chunk_store.ref(collection_id)
+        if collection_ref is not None:
+            deleted_refs = [ref for ref in map(self.chunk_store.ref, deleted_docs) if ref is not None]
+            clauses.append(_all_of(
+                [{"collection_ref": collection_ref}] + ([{"doc_ref": {"$nin": deleted_refs}}] if deleted_refs else [])
+            ))
+        if self.legacy_pending:
+            # Records not yet migrated still carry their ids in metadata
+            clauses.append(_all_of(
+                [{"collection_id": collection_id}] + ([{"source_doc_id": {"$nin": deleted_docs}}] if deleted_docs else [])
+            ))
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+    def _include(self) -> List[str]:
+        # Unmigrated records have no chunk store row, so their text comes back with the hit
+        if self.legacy_pending:
+            return ["distances", "documents", "metadatas"]
+        return ["distances"]
+
+    def _normalize_distance(self, distance: float, space: str) -> float:
+        """
+        Map a raw distance onto [0, 1] so hits from indexes with different spaces compare fairly.
+        """
+        if distance is None:
+            return 1.0
+        upper = DISTANCE_RANGES.get(space, DISTANCE_RANGES["l2"])
+        return min(max(distance / upper, 0.0), 1.0)
+
+    def _format_results(self, results: Dict[str, Any]) -> List[List[Dict[str, Any]]]:
+        """
+        Reshape Chroma's columnar query results into one list of dicts per query row,
+        filling text, snippet and metadata from the chunk store in a single lookup.
+        """
+        chunks = self.chunk_store.get_many([chunk_id for row in results['ids'] for chunk_id in row])
+
         formatted_results = []
-        if results['documents']:
-            count = len(results['documents'][0])
-            for i in range(count):
-                item = {
-                    "id": results['ids'][0][i],
-                    "text": results['documents'][0][i],
-                    "metadata": results['metadatas'][0][i] if results['metadatas'] else {},
-                    "distance": results['distances'][0][i] if results['distances'] else None
-                }
-                formatted_results.append(item)
-                
+        for row, row_ids in enumerate(results['ids']):
+            items = []
+            for i, chunk_id in enumerate(row_ids):
+                chunk = chunks.get(chunk_id)
+                if chunk is None:
+                    chunk = _legacy_chunk(results, row, i)
+                if chunk is None:
+                    # Purged between the vector query and the lookup
+                    continue
+                items.append({
+                    "id": chunk_id,
+                    "text": chunk["text"],
+                    "snippet": chunk["snippet"],
+                    "metadata": chunk["metadata"],
+                    "distance": results['distances'][row][i] if results['distances'] else None
+                })
+            formatted_results.append(items)
+
         return formatted_results
+
+    def _fuse_results(self, result_lists: List[List[Dict[str, Any]]], top_k: int) -> List[Dict[str, Any]]:
+        """
+        Merge several ranked lists with reciprocal rank fusion, de-duplicating by chunk id.
+        """
+        scores: Dict[str, float] = {}
+        items: Dict[str, Dict[str, Any]] = {}
+        for results in result_lists:
+            for rank, item in enumerate(results):
+                scores[item["id"]] = scores.get(item["id"], 0.0) + 1.0 / (RRF_K + rank + 1)
+                # Keep the closest hit for each chunk
+                best = items.get(item["id"])
+                if best is None or (item["distance"] is not None and best["distance"] is not None and item["distance"] < best["distance"]):
+                    items[item["id"]] = item
+
+        ranked_ids = sorted(scores, key=lambda chunk_id: scores[chunk_id], reverse=True)[:top_k]
+        return [{**items[chunk_id], "score": scores[chunk_id]} for chunk_id in ranked_ids]
+
+def _all_of(clauses: List[Dict[str, Any]]) -> Dict[str, Any]:
+    # Chroma's $and needs at least two operands
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+def _legacy_chunk(results: Dict[str, Any], row: int, i: int) -> Optional[Dict[str, Any]]:
+    """
+    Text, snippet and metadata of a hit indexed before the chunk store, read from the
+    query results. None if the hit is not a legacy record.
+    """
+    metadatas = results.get("metadatas")
+    documents = results.get("documents")
+    if not metadatas or not documents or "collection_ref" in (metadatas[row][i] or {}):
+        return None
+    text = documents[row][i] or ""
+    return {
+        "text": text,
+        "snippet": text[:SNIPPET_CHARS].replace("\n", " ") + "...",
+        "metadata": metadatas[row][i]
+    }
+
+def dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+def _delete_where(index, where: Dict[str, Any], batch_size: int):
+    while True:
+        # Only ids are needed; skipping embeddings keeps each round trip small
+        batch = index.get(where=where, limit=batch_size, include=[])
+        if not batch["ids"]:
+            return
+        index.delete(ids=batch["ids"])
@@ -0,0 +1,190 @@
+"""
+Offline tuning harness for the vector index. Builds Chroma indexes over a corpus for
+every combination of HNSW settings and reports recall@k against exact search, queries
+per second and index size, so each collection can be given settings that fit its size.
+
+Run from the repository root:
+
+    python -m backend.app.tuning --synthetic 20000
+    python -m backend.app.tuning --corpus path/to/docs --k 4 --search-ef 10 50 100
+
+Apply the chosen settings with PUT /collections/{collection_id}/index.
+"""
+import argparse
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import List, Dict, Any, Tuple
+import chromadb
+import numpy as np
+from .models.schemas import IndexParams
+from .services.retrieval import hnsw_metadata, dir_size
+
+MB = 1024 * 1024
+
+# Queries scored against the corpus per matrix multiply when computing ground truth
+TRUTH_BLOCK_SIZE = 256
+
+def exact_neighbors(corpus: np.ndarray, queries: np.ndarray, k: int, space: str) -> np.ndarray:
+    """
+    Brute-force top-k corpus rows for each query, ranked by the distance Chroma uses
+    for `space`. Returns an array of shape (len(queries), k).
+    """
+    k = min(k, len(corpus))
+    if space == "cosine":
+        corpus = corpus / np.linalg.norm(corpus, axis=1, keepdims=True)
+        queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    # |q|^2 is the same for every row of a query, so it doesn't change the ranking
+    corpus_sq = np.einsum("ij,ij->i", corpus, corpus)
+
+    neighbors = np.empty((len(queries), k), dtype=np.int64)
+    for start in range(0, len(queries), TRUTH_BLOCK_SIZE):
+        dots = queries[start:start + TRUTH_BLOCK_SIZE] @ corpus.T
+        distances = corpus_sq[None, :] - 2 * dots if space == "l2" else -dots
+        top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        order = np.argsort(np.take_along_axis(distances, top, axis=1), axis=1)
+        neighbors[start:start + TRUTH_BLOCK_SIZE] = np.take_along_axis(top, order, axis=1)
+    return neighbors
+
+def recall_at_k(found: List[List[int]], truth: np.ndarray) -> float:
+    """
+    Fraction of the true top-k neighbors that the index returned.
+    """
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth.tolist()))
+    return hits / truth.size
+
+def synthetic_corpus(n: int, n_queries: int, dim: int, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Unit vectors drawn around random cluster centres, which is closer to real embeddings
+    than uniform noise. Queries come from the same distribution.
+    """
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(max(1, n // 100), dim))
+
+    def sample(count: int) -> np.ndarray:
+        points = centres[rng.integers(len(centres), size=count)] + 0.5 * rng.normal(size=(count, dim))
+        return (points / np.linalg.norm(points, axis=1, keepdims=True)).astype(np.float32)
+
+    return sample(n), sample(n_queries)
+
+def embedded_corpus(path: str, n_queries: int, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Chunk and embed every supported file under `path` the way /ingest does. A random
+    sample of the chunks is used as queries.
+    """
+    from .services.embedding import EmbeddingService
+    from .services.ingestion import IngestionService, ParserFactory
+
+    ingestion_service = IngestionService(max_workers=1)
+    texts = []
+    for root, _, files in os.walk(path):
+        for name in sorted(files):
+            file_path = os.path.join(root, name)
+            try:
+                ParserFactory.get_parser(file_path)
+            except ValueError:
+                continue
+            texts.extend(c["text"] for c in ingestion_service.iter_ingest(file_path, source_doc_id=name))
+    if not texts:
+        raise SystemExit(f"No supported documents found under {path}")
+
+    corpus = np.asarray(EmbeddingService().generate_embeddings(texts), dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    queries = corpus[rng.choice(len(corpus), size=min(n_queries, len(corpus)), replace=False)]
+    return corpus, queries
+
+def evaluate(corpus: np.ndarray, queries: np.ndarray, truth: np.ndarray, params: IndexParams, k: int) -> Dict[str, Any]:
+    """
+    Build one index with `params` in a scratch directory and measure it.
+    """
+    workdir = tempfile.mkdtemp(prefix="rag_vault_tuning_")
+    try:
+        client = chromadb.PersistentClient(path=workdir)
+        index = client.create_collection(name="tuning", metadata=hnsw_metadata(params))
+
+        start = time.perf_counter()
+        for offset in range(0, len(corpus), 1000):
+            batch = corpus[offset:offset + 1000]
+            index.add(ids=[str(i) for i in range(offset, offset + len(batch))], embeddings=batch.tolist())
+        build_s = time.perf_counter() - start
+
+        # One query per call, like a chat turn
+        found = []
+        start = time.perf_counter()
+        for query in queries:
+            results = index.query(query_embeddings=[query.tolist()], n_results=k, include=["distances"])
+            found.append([int(i) for i in results["ids"][0]])
+        query_s = time.perf_counter() - start
+
+        disk_bytes = dir_size(workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        **params.model_dump(),
+        "recall": recall_at_k(found, truth),
+        "qps": len(queries) / query_s,
+        "build_s": build_s,
+        "disk_mb": disk_bytes / MB,
+        # Vectors plus level-0 links (2*M neighbours of 4 bytes each)
+        "est_mem_mb": len(corpus) * (corpus.shape[1] * 4 + params.M * 2 * 4) / MB
+    }
+
+def sweep(corpus: np.ndarray, queries: np.ndarray, k: int, grid: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    rows = []
+    truth_by_space = {space: exact_neighbors(corpus, queries, k, space) for space in grid["space"]}
+    for space, m, construction_ef, search_ef in itertools.product(
+        grid["space"], grid["M"], grid["construction_ef"], grid["search_ef"]
+    ):
+        params = IndexParams(space=space, M=m, construction_ef=construction_ef, search_ef=search_ef)
+        row = evaluate(corpus, queries, truth_by_space[space], params, k)
+        print(_format_row(row), flush=True)
+        rows.append(row)
+    return rows
+
+HEADER = f"{'space':<7}{'M':>4}{'c_ef':>6}{'s_ef':>6}{'recall':>9}{'qps':>10}{'build_s':>9}{'disk_mb':>9}{'mem_mb':>9}"
+
+def _format_row(row: Dict[str, Any]) -> str:
+    return (f"{row['space']:<7}{row['M']:>4}{row['construction_ef']:>6}{row['search_ef']:>6}"
+            f"{row['recall']:>9.3f}{row['qps']:>10.1f}{row['build_s']:>9.2f}{row['disk_mb']:>9.1f}{row['est_mem_mb']:>9.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep HNSW settings and report recall@k vs. QPS vs. memory")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--synthetic", type=int, metavar="N", help="use N synthetic unit vectors")
+    source.add_argument("--corpus", metavar="PATH", help="chunk and embed the documents under PATH")
+    parser.add_argument("--dim", type=int, default=384, help="synthetic vector size (all-MiniLM-L6-v2 is 384)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--space", nargs="+", default=["l2"], choices=["l2", "cosine", "ip"])
+    parser.add_argument("--M", nargs="+", type=int, default=[8, 16, 32])
+    parser.add_argument("--construction-ef", nargs="+", type=int, default=[100, 200])
+    parser.add_argument("--search-ef", nargs="+", type=int, default=[10, 50, 100])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", metavar="FILE", help="also write the results as JSON")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        corpus, queries = synthetic_corpus(args.synthetic, args.queries, args.dim, args.seed)
+    else:
+        corpus, queries = embedded_corpus(args.corpus, args.queries, args.seed)
+    print(f"Corpus: {len(corpus)} vectors x {corpus.shape[1]} dims, {len(queries)} queries, recall@{args.k}\n")
+
+    grid = {
+        "space": args.space,
+        "M": args.M,
+        "construction_ef": args.construction_ef,
+        "search_ef": args.search_ef
+    }
+    print(HEADER)
+    rows = sweep(corpus, queries, args.k, grid)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+if __name__ == "__main__":
+    main()
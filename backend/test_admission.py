@@ -0,0 +1,93 @@
+from app.services.admission import AdmissionController, AdmissionRejected
+from app.services import admission
+import asyncio
+
+async def _hold(controller, key, started, release):
+    async with controller.slot(key):
+        started.append(key)
+        await release.wait()
+
+async def _run():
+    controller = AdmissionController("test", max_concurrency=2, per_key_concurrency=1, max_queue=1)
+    started = []
+    release = asyncio.Event()
+    
+    # 1. Per-key limit: the second request for col-A queues, col-B runs
+    first = asyncio.create_task(_hold(controller, "col-A", started, release))
+    second = asyncio.create_task(_hold(controller, "col-A", started, release))
+    third = asyncio.create_task(_hold(controller, "col-B", started, release))
+    await asyncio.sleep(0.05)
+    print(f"Stats while busy: {controller.stats()}")
+    assert sorted(started) == ["col-A", "col-B"]
+    assert controller.stats()["queue_depth"] == 1
+    assert controller.active("col-A") == 1 and controller.active("col-C") == 0
+    
+    # 2. Queue is full, so the next request is rejected
+    try:
+        await controller.acquire("col-C")
+        assert False, "expected rejection"
+    except AdmissionRejected:
+        pass
+    assert controller.stats()["rejected"] == 1
+    
+    # 3. Releasing lets the queued request in
+    release.set()
+    await asyncio.gather(first, second, third)
+    stats = controller.stats()
+    print(f"Stats when idle: {stats}")
+    assert started == ["col-A", "col-B", "col-A"]
+    assert stats["in_flight"] == 0 and stats["queue_depth"] == 0
+    assert stats["admitted"] == 3
+
+def test_admission():
+    asyncio.run(_run())
+    print("TEST PASSED")
+
+async def _admit(controller, key="col-A"):
+    async with controller.slot(key):
+        pass
+
+async def _run_adaptive(rss):
+    controller = AdmissionController(
+        "test", max_concurrency=8, per_key_concurrency=8, max_queue=8,
+        target_wait_s=0.5, max_rss_mb=100
+    )
+    
+    # 1. Over the memory limit, concurrency halves on every adjustment, down to the minimum
+    rss[0] = 200
+    for expected in (4, 2, 1, 1):
+        await _admit(controller)
+        assert controller.limit == expected
+    assert controller.stats()["rss_mb"] == 200
+    
+    # 2. Once memory is back under the limit it grows back by one at a time
+    rss[0] = 50
+    for expected in (2, 3):
+        await _admit(controller)
+        assert controller.limit == expected
+    
+    # 3. While the average queue wait is over target the queue bound halves, then it recovers
+    controller.avg_wait_s = 10.0
+    await _admit(controller)
+    await _admit(controller)
+    assert controller.queue_limit == 2
+    controller.avg_wait_s = 0.0
+    await _admit(controller)
+    assert controller.queue_limit == 3
+    print(f"Adapted stats: {controller.stats()}")
+
+def test_adaptive_limits():
+    # Adjust on every admission and read RSS from the test instead of /proc
+    rss = [0.0]
+    saved = (admission.ADJUST_INTERVAL_S, admission.current_rss_mb)
+    admission.ADJUST_INTERVAL_S = 0
+    admission.current_rss_mb = lambda: rss[0]
+    try:
+        asyncio.run(_run_adaptive(rss))
+    finally:
+        admission.ADJUST_INTERVAL_S, admission.current_rss_mb = saved
+    print("TEST PASSED")
+
+if __name__ == "__main__":
+    test_admission()
+    test_adaptive_limits()
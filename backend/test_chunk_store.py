@@ -0,0 +1,52 @@
+from app.services.chunk_store import ChunkStore
+import shutil
+import os
+
+def test_chunk_store():
+    if os.path.exists("./test_chunk_store"):
+        shutil.rmtree("./test_chunk_store")
+        
+    store = ChunkStore(persist_dir="./test_chunk_store")
+    
+    # 1. Add chunks; the vector metadata is only integer refs
+    ids = ["doc-1_0", "doc-1_1", "doc-2_0"]
+    texts = ["Saffron goes in the soup.\nAlways.", "Paris is the capital of France.", "Python is a language."]
+    metadatas = [
+        {"collection_id": "col-A", "source_doc_id": "doc-1", "filename": "notes.md", "page_number": 1, "paragraph": 3, "section": "Soup"},
+        {"collection_id": "col-A", "source_doc_id": "doc-1", "filename": "notes.md", "page_number": 2, "section": "Geo"},
+        {"collection_id": "col-B", "source_doc_id": "doc-2", "filename": "code.txt", "page_number": 1, "line_number": 12},
+    ]
+    vector_metadatas = store.add(ids, texts, metadatas)
+    print(f"Vector metadata: {vector_metadatas}")
+    assert all(set(m) == {"collection_ref", "doc_ref"} for m in vector_metadatas)
+    assert vector_metadatas[0] == vector_metadatas[1]
+    
+    # 2. Lookup rebuilds full metadata and the precomputed snippet
+    chunks = store.get_many(["doc-1_0", "doc-2_0", "missing"])
+    assert set(chunks) == {"doc-1_0", "doc-2_0"}
+    assert chunks["doc-1_0"]["snippet"] == "Saffron goes in the soup. Always...."
+    assert chunks["doc-1_0"]["metadata"]["filename"] == "notes.md"
+    assert chunks["doc-1_0"]["metadata"]["section"] == "Soup"
+    assert chunks["doc-2_0"]["metadata"]["collection_id"] == "col-B"
+    assert chunks["doc-1_0"]["metadata"]["paragraph"] == 3
+    assert chunks["doc-2_0"]["metadata"]["line_number"] == 12
+    assert chunks["doc-2_0"]["metadata"]["paragraph"] is None
+    
+    # 3. Batched id listing and delete
+    assert store.chunk_ids(source_doc_id="doc-1", limit=1) in (["doc-1_0"], ["doc-1_1"])
+    store.delete(store.chunk_ids(collection_id="col-A"))
+    assert store.chunk_ids(collection_id="col-A") == []
+    assert store.chunk_ids(collection_id="col-unknown") == []
+    
+    # 4. Refs and state survive a reopen
+    assert store.get_state("legacy_migrated") is None
+    store.set_state("legacy_migrated", "1")
+    reopened = ChunkStore(persist_dir="./test_chunk_store")
+    assert reopened.get_state("legacy_migrated") == "1"
+    assert reopened.ref("col-B") == store.ref("col-B")
+    assert reopened.get_many(["doc-2_0"])["doc-2_0"]["text"] == "Python is a language."
+    
+    print("TEST PASSED")
+
+if __name__ == "__main__":
+    test_chunk_store()
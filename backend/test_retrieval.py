@@ -1,4 +1,5 @@
 from app.services.retrieval import RetrievalService
+from app.models.schemas import IndexParams
 import shutil
 import os
 
@@ -46,6 +47,73 @@ def test_retrieval():
         
     assert any("Python" in r['text'] for r in results_b)
     
+    # 4. Batch search keeps input order across collections
+    print("\nBatch searching both collections...")
+    batch = service.search_many([
+        ("col-B", "programming"),
+        ("col-A", "What is the secret ingredient?"),
+    ], top_k=2)
+    assert len(batch) == 2
+    assert all(r['metadata']['collection_id'] == "col-B" for r in batch[0])
+    assert any("saffron" in r['text'] for r in batch[1])
+    
+    # 5. Fused query expansion returns one de-duplicated list
+    fused = service.search_many([
+        ("col-A", "soup ingredient"),
+        ("col-A", "what spice goes in the soup"),
+    ], top_k=2, fuse=True)
+    print(f" - Fused: {[r['text'] for r in fused]}")
+    assert len(fused) == len({r['id'] for r in fused})
+    assert "saffron" in fused[0]['text']
+    
+    # 6. Multi-collection search merges hits into one global top-k
+    print("\nSearching across Collections A and B...")
+    merged = service.search_collections(["col-A", "col-B"], "programming language", top_k=3)
+    for res in merged:
+        print(f" - Found: {res['text']} ({res['metadata']['collection_id']}, norm: {res['normalized_distance']:.3f})")
+    assert len(merged) == 3
+    assert "Python" in merged[0]['text']
+    assert [r['normalized_distance'] for r in merged] == sorted(r['normalized_distance'] for r in merged)
+    
+    # 7. A collection can move to a dedicated index with its own HNSW settings
+    print("\nRebuilding Collection A's index with cosine distance...")
+    params = IndexParams(space="cosine", M=32, search_ef=64)
+    assert service.start_rebuild("col-A", params)
+    assert not service.start_rebuild("col-A", params)
+    moved = service.configure_index("col-A", params)
+    assert moved == 3
+    assert "col-A" not in service.rebuilds
+    assert service.get_index_params("col-A").space == "cosine"
+    assert any("saffron" in r['text'] for r in service.search("col-A", "What is the secret ingredient?", top_k=2))
+    assert not any("saffron" in r['text'] for r in service.search("col-B", "secret ingredient", top_k=2))
+    
+    # 8. Tombstoned data is hidden immediately, then purged in batches
+    print("\nDeleting collection B...")
+    service.add_tombstone("collection", "col-B", "col-B")
+    assert service.search("col-B", "programming", top_k=2) == []
+    removed = service.delete_vectors(collection_id="col-B", batch_size=1)
+    service.remove_tombstone("collection", "col-B", "col-B")
+    assert removed == 1
+    assert service.search("col-B", "programming", top_k=2) == []
+    assert len(service.search("col-A", "soup", top_k=4)) == 3
+    
+    # 9. Records indexed before the chunk store are searchable until migrated, then move over
+    print("\nMigrating a legacy record...")
+    service.collection.add(
+        ids=["legacy-1"],
+        embeddings=[service.embedding_service.generate_embedding("Bread needs yeast to rise.")],
+        metadatas=[{"collection_id": "col-C", "source_doc_id": "doc-old", "filename": "bread.txt", "page_number": 1}],
+        documents=["Bread needs yeast to rise."]
+    )
+    service.legacy_pending = True
+    assert service.search("col-C", "yeast", top_k=1)[0]['metadata']['filename'] == "bread.txt"
+    assert service.migrate_legacy(batch_size=2) == 1
+    assert not service.legacy_pending
+    migrated = service.collection.get(ids=["legacy-1"], include=["metadatas", "documents"])
+    assert set(migrated["metadatas"][0]) == {"collection_ref", "doc_ref"}
+    assert not migrated["documents"][0]
+    assert service.search("col-C", "yeast", top_k=1)[0]['text'] == "Bread needs yeast to rise."
+    
     print("\nTEST PASSED")
 
 if __name__ == "__main__":
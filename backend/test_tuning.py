@@ -0,0 +1,28 @@
+from app.tuning import exact_neighbors, recall_at_k, synthetic_corpus
+import numpy as np
+
+def test_exact_neighbors():
+    corpus, queries = synthetic_corpus(2000, 20, dim=32)
+    
+    # Compare the vectorized ground truth against a naive per-pair computation
+    naive_distances = {
+        "l2": ((queries[:, None, :] - corpus[None, :, :]) ** 2).sum(axis=-1),
+        "cosine": 1 - queries @ corpus.T, # synthetic vectors are unit length
+        "ip": 1 - queries @ corpus.T
+    }
+    for space, distances in naive_distances.items():
+        truth = exact_neighbors(corpus, queries, k=10, space=space)
+        naive = np.argsort(distances, axis=1)[:, :10]
+        recall = recall_at_k(naive.tolist(), truth)
+        print(f"{space}: recall of naive search vs. ground truth = {recall}")
+        assert truth.shape == (20, 10)
+        assert recall == 1.0
+    
+    # Missing half of the neighbours halves recall
+    truth = exact_neighbors(corpus, queries, k=10, space="l2")
+    assert recall_at_k([row[:5] for row in truth.tolist()], truth) == 0.5
+    
+    print("TEST PASSED")
+
+if __name__ == "__main__":
+    test_exact_neighbors()